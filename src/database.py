@@ -1,177 +1,430 @@
+import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, Optional
 import pandas as pd
 
 
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Bump when the DDL in _create_schema changes
+SCHEMA_VERSION = 1
+
+
+# SQL is kept in module-level constants so every call reuses the same
+# string and hits the connection's prepared-statement cache.
+_INSERT_ACCOUNT_SQL = """
+    INSERT INTO accounts (account_name, account_type, institution)
+    VALUES (?, ?, ?)
+"""
+
+_SELECT_ACCOUNT_ID_SQL = "SELECT account_id FROM accounts WHERE account_name = ?"
+
+_TXN_COLUMNS = [
+    'transaction_date', 'post_date', 'description',
+    'original_category', 'transaction_type', 'amount', 'memo'
+]
+
+# Columns of the UNIQUE constraint (besides account_id); all are NOT NULL
+_TXN_KEY_COLUMNS = ['transaction_date', 'description', 'amount']
+
+_SELECT_TXN_KEYS_SQL = """
+    SELECT transaction_date, description, amount
+    FROM transactions
+    WHERE account_id = ? AND transaction_date BETWEEN ? AND ?
+"""
+
+_INSERT_TXN_SQL = """
+    INSERT INTO transactions (
+        account_id, transaction_date, post_date, description,
+        original_category, transaction_type, amount, memo
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_CREATE_TXN_STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS txn_staging (
+        account_id INTEGER NOT NULL,
+        transaction_date DATE NOT NULL,
+        post_date DATE,
+        description TEXT NOT NULL,
+        original_category TEXT,
+        transaction_type TEXT,
+        amount REAL NOT NULL,
+        memo TEXT
+    )
+"""
+
+_INSERT_TXN_STAGING_SQL = """
+    INSERT INTO temp.txn_staging (
+        account_id, transaction_date, post_date, description,
+        original_category, transaction_type, amount, memo
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_TXN_FROM_STAGING_SQL = """
+    INSERT OR IGNORE INTO main.transactions (
+        account_id, transaction_date, post_date, description,
+        original_category, transaction_type, amount, memo
+    )
+    SELECT
+        account_id, transaction_date, post_date, description,
+        original_category, transaction_type, amount, memo
+    FROM temp.txn_staging
+"""
+
+# Separate statements (rather than an OR'd filter) so each gets a clean
+# index plan and its own prepared-statement cache entry.
+_TXN_SELECT = """
+    SELECT 
+        t.*,
+        a.account_name,
+        a.institution
+    FROM transactions t
+    JOIN accounts a ON t.account_id = a.account_id
+"""
+
+_TXN_SELECT_ALL = _TXN_SELECT + """
+    ORDER BY t.transaction_date DESC
+    LIMIT ?
+"""
+
+_TXN_SELECT_ACCOUNT = _TXN_SELECT + """
+    WHERE t.account_id = ?
+    ORDER BY t.transaction_date DESC
+    LIMIT ?
+"""
+
+_ACCOUNT_STATS_SELECT = """
+    SELECT 
+        a.account_id,
+        a.account_name,
+        a.account_type,
+        a.institution,
+        COUNT(t.transaction_id) as count,
+        COALESCE(SUM(CASE WHEN t.amount < 0 THEN -t.amount ELSE 0 END), 0) as negative_sum,
+        COALESCE(SUM(CASE WHEN t.amount > 0 THEN t.amount ELSE 0 END), 0) as positive_sum,
+        COALESCE(SUM(t.amount), 0) as net
+    FROM accounts a
+    LEFT JOIN transactions t ON t.account_id = a.account_id
+"""
+
+_ALL_ACCOUNT_STATS_SQL = _ACCOUNT_STATS_SELECT + """
+    GROUP BY a.account_id
+    ORDER BY a.account_id
+"""
+
+_ONE_ACCOUNT_STATS_SQL = _ACCOUNT_STATS_SELECT + """
+    WHERE a.account_id = ?
+    GROUP BY a.account_id
+"""
+
+
 class FinanceDB:
     """Manages SQLite database for financial transactions."""
     
-    def __init__(self, db_path: str = "data/finance.db"):
-        self.db_path = db_path
-        self.conn: Optional[sqlite3.Connection] = None
-        self.init_database()
+    # One shared instance (and connection) per database file
+    _instances: Dict[str, "FinanceDB"] = {}
+    _instances_lock = threading.Lock()
+    
+    def __new__(cls, db_path: str = "data/finance.db"):
+        # Lookup and connection happen under one lock so concurrent callers
+        # for the same file never open two connections
+        key = str(Path(db_path).resolve())
+        with cls._instances_lock:
+            instance = cls._instances.get(key)
+            if instance is not None:
+                # Shared instance is already connected; close() releases this handle
+                with instance._lock:
+                    instance._refs += 1
+                return instance
+            
+            instance = super().__new__(cls)
+            instance._key = key
+            instance.db_path = db_path
+            instance.conn: Optional[sqlite3.Connection] = None
+            instance._refs = 1
+            # Serializes transactions, writes and reads on the shared connection
+            instance._lock = threading.RLock()
+            # account_name -> account_id; accounts are never deleted, so only
+            # a rolled-back transaction can make an entry stale
+            instance._account_cache: Dict[str, int] = {}
+            instance.init_database()
+            cls._instances[key] = instance
+            return instance
     
     def init_database(self):
         """Initialize database and create tables if they don't exist."""
         # Ensure directory exists
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
         
-        self.conn = sqlite3.connect(self.db_path)
-        cursor = self.conn.cursor()
+        # Autocommit mode: transactions are managed explicitly via transaction()
+        self.conn = sqlite3.connect(
+            self.db_path, isolation_level=None, cached_statements=256, check_same_thread=False
+        )
+        self._apply_pragmas()
         
-        # Accounts table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS accounts (
-                account_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_name TEXT NOT NULL UNIQUE,
-                account_type TEXT NOT NULL,
-                institution TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        # Skip the DDL entirely when the schema is already current
+        schema_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version < SCHEMA_VERSION:
+            self._create_schema()
         
-        # Transactions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER NOT NULL,
-                transaction_date DATE NOT NULL,
-                post_date DATE,
-                description TEXT NOT NULL,
-                original_category TEXT,
-                custom_category TEXT,
-                transaction_type TEXT,
-                amount REAL NOT NULL,
-                memo TEXT,
-                imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (account_id) REFERENCES accounts (account_id),
-                UNIQUE(account_id, transaction_date, description, amount)
-            )
-        """)
+        logger.info("✅ Database initialized: %s", self.db_path)
+    
+    def _create_schema(self):
+        """Create tables and indexes, then stamp the schema version."""
+        cursor = self.conn.cursor()
         
-        # Categories table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS categories (
-                category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                category_name TEXT NOT NULL UNIQUE,
-                category_type TEXT NOT NULL,
-                parent_category TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        with self.transaction():
+            # Accounts table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS accounts (
+                    account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    account_name TEXT NOT NULL UNIQUE,
+                    account_type TEXT NOT NULL,
+                    institution TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
         
-        # Category rules table (for auto-categorization)
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS category_rules (
-                rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword TEXT NOT NULL,
-                category_name TEXT NOT NULL,
-                priority INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (category_name) REFERENCES categories (category_name)
-            )
-        """)
+            # Transactions table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS transactions (
+                    transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    account_id INTEGER NOT NULL,
+                    transaction_date DATE NOT NULL,
+                    post_date DATE,
+                    description TEXT NOT NULL,
+                    original_category TEXT,
+                    custom_category TEXT,
+                    transaction_type TEXT,
+                    amount REAL NOT NULL,
+                    memo TEXT,
+                    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (account_id) REFERENCES accounts (account_id),
+                    UNIQUE(account_id, transaction_date, description, amount)
+                )
+            """)
+            
+            # Per-account lookups are served by the UNIQUE index, whose leading
+            # columns are (account_id, transaction_date); this one covers
+            # date-ordered scans across all accounts
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_txn_date
+                ON transactions (transaction_date DESC)
+            """)
+        
+            # Categories table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS categories (
+                    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    category_name TEXT NOT NULL UNIQUE,
+                    category_type TEXT NOT NULL,
+                    parent_category TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
         
-        self.conn.commit()
-        print(f"✅ Database initialized: {self.db_path}")
+            # Category rules table (for auto-categorization)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS category_rules (
+                    rule_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    keyword TEXT NOT NULL,
+                    category_name TEXT NOT NULL,
+                    priority INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (category_name) REFERENCES categories (category_name)
+                )
+            """)
+            
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    
+    def _apply_pragmas(self):
+        """Tune the connection for write throughput. Run once per connection."""
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-64000")  # 64 MiB
+        cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        cursor.execute("PRAGMA foreign_keys=ON")
+    
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block inside a single BEGIN IMMEDIATE ... COMMIT transaction.
+        Rolls back on error. Nested calls from the same thread join the outer
+        transaction; other threads wait until it finishes.
+        """
+        with self._lock:
+            if self.conn.in_transaction:
+                yield self.conn
+                return
+            
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                # SQLite may already have rolled back on some errors
+                if self.conn.in_transaction:
+                    self.conn.execute("ROLLBACK")
+                # Accounts added in this transaction no longer exist
+                self._account_cache.clear()
+                raise
+            self.conn.execute("COMMIT")
     
     def add_account(self, account_name: str, account_type: str, institution: str) -> int:
         """Add a new account. Returns account_id."""
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO accounts (account_name, account_type, institution)
-                VALUES (?, ?, ?)
-            """, (account_name, account_type, institution))
-            self.conn.commit()
-            print(f"✅ Added account: {account_name}")
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
-            # Account already exists, get its ID
-            cursor.execute("""
-                SELECT account_id FROM accounts WHERE account_name = ?
-            """, (account_name,))
-            account_id = cursor.fetchone()[0]
-            print(f"ℹ️  Account already exists: {account_name} (ID: {account_id})")
+        with self._lock:
+            account_id = self._account_cache.get(account_name)
+            if account_id is not None:
+                logger.info("ℹ️  Account already exists: %s (ID: %s)", account_name, account_id)
+                return account_id
+            
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(_INSERT_ACCOUNT_SQL, (account_name, account_type, institution))
+                account_id = cursor.lastrowid
+                logger.info("✅ Added account: %s", account_name)
+            except sqlite3.IntegrityError:
+                # Account already exists, get its ID
+                cursor.execute(_SELECT_ACCOUNT_ID_SQL, (account_name,))
+                account_id = cursor.fetchone()[0]
+                logger.info("ℹ️  Account already exists: %s (ID: %s)", account_name, account_id)
+            
+            self._account_cache[account_name] = account_id
             return account_id
     
     def get_account_id(self, account_name: str) -> Optional[int]:
         """Get account ID by name."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT account_id FROM accounts WHERE account_name = ?", (account_name,))
-        result = cursor.fetchone()
-        return result[0] if result else None
+        with self._lock:
+            account_id = self._account_cache.get(account_name)
+            if account_id is not None:
+                return account_id
+            
+            cursor = self.conn.cursor()
+            cursor.execute(_SELECT_ACCOUNT_ID_SQL, (account_name,))
+            result = cursor.fetchone()
+            if result is None:
+                return None
+            
+            self._account_cache[account_name] = result[0]
+            return result[0]
     
-    def insert_transactions(self, transactions_df: pd.DataFrame, account_id: int) -> int:
+    def insert_transactions(self, transactions_df: pd.DataFrame, account_id: int,
+                            use_staging: bool = False) -> int:
         """
         Insert transactions from DataFrame.
         Returns number of new transactions inserted.
+        
+        With use_staging=True the rows are bulk-loaded into the in-memory
+        temp.txn_staging table and copied over with one INSERT OR IGNORE ...
+        SELECT, so duplicates are resolved by SQLite instead of the Python
+        anti-join. Useful for very large batches: staging writes stay in
+        memory and the main database sees a single bulk insert.
         """
-        inserted = 0
-        skipped = 0
+        # Project the columns once; optional ones missing from the CSV become NULL
+        df_rows = transactions_df.reindex(columns=_TXN_COLUMNS)
         
-        cursor = self.conn.cursor()
+        # Rows missing a NOT NULL key field can't be stored
+        is_valid = df_rows[_TXN_KEY_COLUMNS].notna().all(axis=1)
+        invalid = len(df_rows) - int(is_valid.sum())
+        if invalid:
+            df_rows = df_rows[is_valid]
+            logger.warning("⚠️  Skipped %d transactions missing a date, description or amount", invalid)
         
-        for _, row in transactions_df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT INTO transactions (
-                        account_id, transaction_date, post_date, description,
-                        original_category, transaction_type, amount, memo
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    account_id,
-                    row['transaction_date'],
-                    row.get('post_date'),
-                    row['description'],
-                    row.get('original_category'),
-                    row.get('transaction_type'),
-                    row['amount'],
-                    row.get('memo')
-                ))
-                inserted += 1
-            except sqlite3.IntegrityError:
-                # Duplicate transaction
-                skipped += 1
-                continue
+        with self.transaction():
+            if df_rows.empty:
+                inserted = 0
+            elif use_staging:
+                # INSERT OR IGNORE ... SELECT dedups against the UNIQUE key in SQLite
+                inserted = self._insert_via_staging(df_rows, account_id)
+            else:
+                df_new = self._filter_new_transactions(df_rows, account_id)
+                inserted = self._insert_rows(df_new, account_id) if not df_new.empty else 0
+        skipped = len(df_rows) - inserted
         
-        self.conn.commit()
-        print(f"✅ Inserted {inserted} new transactions")
+        logger.info("✅ Inserted %d new transactions", inserted)
         if skipped > 0:
-            print(f"⏭️  Skipped {skipped} duplicate transactions")
+            logger.info("⏭️  Skipped %d duplicate transactions", skipped)
         
         return inserted
     
-    def get_transactions(self, account_id: Optional[int] = None, limit: int = 100) -> pd.DataFrame:
-        """Get transactions as DataFrame."""
-        query = """
-            SELECT 
-                t.*,
-                a.account_name,
-                a.institution
-            FROM transactions t
-            JOIN accounts a ON t.account_id = a.account_id
+    def _filter_new_transactions(self, df_rows: pd.DataFrame, account_id: int) -> pd.DataFrame:
+        """
+        Drop rows that are already stored for this account (anti-join on the
+        UNIQUE key) or repeated within the batch.
         """
+        df_rows = df_rows.drop_duplicates(subset=_TXN_KEY_COLUMNS)
+        if df_rows.empty:
+            return df_rows
         
-        if account_id:
-            query += f" WHERE t.account_id = {account_id}"
+        # Only existing rows within the batch's date range can collide
+        dates = df_rows['transaction_date']
+        cursor = self.conn.cursor()
+        cursor.execute(_SELECT_TXN_KEYS_SQL, (account_id, dates.min(), dates.max()))
+        existing = cursor.fetchall()
+        if not existing:
+            return df_rows
         
-        query += f" ORDER BY t.transaction_date DESC LIMIT {limit}"
+        is_duplicate = pd.MultiIndex.from_frame(df_rows[_TXN_KEY_COLUMNS]).isin(existing)
+        return df_rows[~is_duplicate]
+    
+    def _insert_rows(self, df_rows: pd.DataFrame, account_id: int) -> int:
+        """Insert projected rows with executemany. Returns rows inserted."""
+        rows = self._to_row_tuples(df_rows, account_id)
         
-        return pd.read_sql_query(query, self.conn)
+        cursor = self.conn.cursor()
+        
+        with self.transaction():
+            cursor.executemany(_INSERT_TXN_SQL, rows)
+        return cursor.rowcount
+    
+    @staticmethod
+    def _to_row_tuples(df_rows: pd.DataFrame, account_id: int) -> list:
+        """Convert projected rows to parameter tuples, with NULL for missing values."""
+        df_rows = df_rows.astype(object).where(df_rows.notna(), None)
+        return [(account_id, *row) for row in df_rows.itertuples(index=False, name=None)]
+    
+    def _insert_via_staging(self, df_rows: pd.DataFrame, account_id: int) -> int:
+        """
+        Insert projected rows through the temp.txn_staging table
+        (temp_store=MEMORY), then copy them with one INSERT ... SELECT.
+        Returns rows inserted.
+        """
+        rows = self._to_row_tuples(df_rows, account_id)
+        
+        cursor = self.conn.cursor()
+        
+        with self.transaction():
+            cursor.execute(_CREATE_TXN_STAGING_SQL)
+            cursor.executemany(_INSERT_TXN_STAGING_SQL, rows)
+            cursor.execute(_INSERT_TXN_FROM_STAGING_SQL)
+            inserted = cursor.rowcount
+            cursor.execute("DELETE FROM temp.txn_staging")
+        return inserted
+    
+    def get_transactions(self, account_id: Optional[int] = None, limit: int = 100) -> pd.DataFrame:
+        """Get transactions as DataFrame."""
+        # Holding the lock keeps other threads' uncommitted imports out of view
+        with self._lock:
+            if account_id:
+                return pd.read_sql_query(_TXN_SELECT_ACCOUNT, self.conn, params=(account_id, limit))
+            return pd.read_sql_query(_TXN_SELECT_ALL, self.conn, params=(limit,))
     
     
     def get_summary(self, account_id: Optional[int] = None) -> dict:
         """Get summary statistics, account-type aware."""
         cursor = self.conn.cursor()
         
-        # Get all accounts or specific account
-        if account_id:
-            cursor.execute("SELECT * FROM accounts WHERE account_id = ?", (account_id,))
-            accounts = [cursor.fetchone()]
-        else:
-            cursor.execute("SELECT * FROM accounts")
+        # Per-account stats in a single grouped scan
+        with self._lock:
+            if account_id:
+                cursor.execute(_ONE_ACCOUNT_STATS_SQL, (account_id,))
+            else:
+                cursor.execute(_ALL_ACCOUNT_STATS_SQL)
             accounts = cursor.fetchall()
         
         summary = {
@@ -181,25 +434,8 @@ class FinanceDB:
         }
         
         for account in accounts:
-            acc_id, acc_name, acc_type, institution, _ = account
-            
-            # Get transaction stats for this account
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as count,
-                    SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) as negative_sum,
-                    SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) as positive_sum,
-                    SUM(amount) as net
-                FROM transactions 
-                WHERE account_id = ?
-            """, (acc_id,))
-            
-            result = cursor.fetchone()
-            count, negative_sum, positive_sum, net = result
-            
-            negative_sum = abs(negative_sum) if negative_sum else 0
-            positive_sum = positive_sum if positive_sum else 0
-            net = net if net else 0
+            # Sums arrive non-null, with negative_sum already absolute
+            acc_id, acc_name, acc_type, institution, count, negative_sum, positive_sum, net = account
             
             # Interpret based on account type
             if 'credit' in acc_type.lower():
@@ -234,14 +470,23 @@ class FinanceDB:
         return summary
     
     def close(self):
-        """Close database connection."""
-        if self.conn:
+        """Release this handle; the connection closes once every handle is released."""
+        with self._instances_lock, self._lock:
+            if not self.conn:
+                return
+            self._refs -= 1
+            if self._refs > 0:
+                return
             self.conn.close()
-            print("Database connection closed")
+            self.conn = None
+            self._instances.pop(self._key, None)
+            logger.info("Database connection closed")
 
 
 # Test the database
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     print("Testing FinanceDB...\n")
     
     db = FinanceDB()
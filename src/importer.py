@@ -1,3 +1,4 @@
+import logging
 import pandas as pd
 from pathlib import Path
 from typing import Optional
@@ -5,6 +6,28 @@ from database import FinanceDB
 from datetime import datetime
 
 
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+# Columns in a standard Chase credit card export, mapped to transactions columns
+CHASE_HEADER_MAP = {
+    'Transaction Date': 'transaction_date',
+    'Post Date': 'post_date',
+    'Description': 'description',
+    'Category': 'original_category',
+    'Type': 'transaction_type',
+    'Amount': 'amount',
+    'Memo': 'memo',
+}
+
+# Transactions columns read as strings / parsed as dates
+TEXT_FIELDS = {'description', 'original_category', 'transaction_type', 'memo'}
+DATE_FIELDS = {'transaction_date', 'post_date'}
+
+# Rows parsed, cleaned and inserted at a time
+CSV_CHUNK_SIZE = 10_000
+
+
 class ChaseImporter:
     """Imports Chase credit card CSV files."""
     
@@ -22,80 +45,109 @@ class ChaseImporter:
         Returns:
             Number of transactions imported
         """
-        print(f"\n📂 Importing: {csv_path}")
+        logger.info("📂 Importing: %s", csv_path)
         
         # Check if file exists
         if not Path(csv_path).exists():
-            print(f"❌ File not found: {csv_path}")
+            logger.error("❌ File not found: %s", csv_path)
             return 0
         
-        # Read CSV
+        # Read CSV lazily in chunks
         try:
-            df = pd.read_csv(csv_path)
-            print(f"✅ Read {len(df)} rows from CSV")
+            chunks = self._read_chase_csv(csv_path, chunksize=CSV_CHUNK_SIZE)
         except Exception as e:
-            print(f"❌ Error reading CSV: {e}")
+            logger.error("❌ Error reading CSV: %s", e)
             return 0
         
-        # Display columns to verify format
-        print(f"\n📋 Columns found: {list(df.columns)}")
-        print(f"\n👀 First few rows:")
-        print(df.head())
-        
-        # Clean and standardize data
-        df_clean = self._clean_chase_data(df)
+        rows_read = 0
+        inserted = 0
         
-        # Add or get account
-        account_id = self.db.add_account(
-            account_name=account_name,
-            account_type="Credit Card",
-            institution="Chase"
-        )
+        # Add account and insert each cleaned chunk in one transaction
+        try:
+            with chunks, self.db.transaction():
+                account_id = self.db.add_account(
+                    account_name=account_name,
+                    account_type="Credit Card",
+                    institution="Chase"
+                )
+                
+                for i, chunk in enumerate(chunks):
+                    if i == 0:
+                        # Display columns to verify format
+                        logger.info("📋 Columns found: %s", list(chunk.columns))
+                        logger.info("👀 First few rows:\n%s", chunk.head())
+                    
+                    rows_read += len(chunk)
+                    
+                    # Clean and standardize data
+                    chunk_clean = self._clean_chase_data(chunk)
+                    inserted += self.db.insert_transactions(chunk_clean, account_id)
+        except (pd.errors.ParserError, UnicodeDecodeError, ValueError) as e:
+            # transaction() has already rolled back the partial import;
+            # database errors propagate to the caller
+            logger.error("❌ Error reading CSV: %s", e)
+            return 0
         
-        # Insert transactions
-        inserted = self.db.insert_transactions(df_clean, account_id)
+        logger.info("✅ Read %d rows from CSV", rows_read)
         
         return inserted
     
-    def _clean_chase_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Clean and standardize Chase CSV data."""
-        df_clean = df.copy()
+    def _read_chase_csv(self, csv_path: str, chunksize: Optional[int] = None):
+        """
+        Read a Chase CSV with explicit column types.
         
-        # Standardize column names (Chase format may vary slightly)
-        column_mapping = {}
+        Only columns that map to a transactions field are parsed; files with
+        unrecognized headers fall back to reading every column with type
+        inference. With chunksize set, returns an iterator of DataFrames instead.
+        """
+        header = pd.read_csv(csv_path, nrows=0).columns
+        column_mapping = self._map_columns(header)
         
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            if 'transaction' in col_lower and 'date' in col_lower:
-                column_mapping[col] = 'transaction_date'
-            elif 'post' in col_lower and 'date' in col_lower:
-                column_mapping[col] = 'post_date'
-            elif 'description' in col_lower:
-                column_mapping[col] = 'description'
-            elif 'category' in col_lower:
-                column_mapping[col] = 'original_category'
-            elif 'type' in col_lower:
-                column_mapping[col] = 'transaction_type'
-            elif 'amount' in col_lower:
-                column_mapping[col] = 'amount'
-            elif 'memo' in col_lower:
-                column_mapping[col] = 'memo'
+        if not column_mapping:
+            return pd.read_csv(csv_path, chunksize=chunksize)
+        
+        return pd.read_csv(
+            csv_path,
+            engine='c',
+            usecols=list(column_mapping),
+            dtype={col: 'string' for col, field in column_mapping.items() if field in TEXT_FIELDS},
+            parse_dates=[col for col, field in column_mapping.items() if field in DATE_FIELDS],
+            cache_dates=True,
+            chunksize=chunksize
+        )
+    
+    def _clean_chase_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Clean and standardize Chase CSV data."""
+        # Mutate in place: df is freshly read from CSV and not reused by the caller
+        df_clean = df
         
-        df_clean.rename(columns=column_mapping, inplace=True)
+        # Standardize column names
+        df_clean.rename(columns=self._map_columns(df.columns), inplace=True)
         
         # Convert dates to standard format
         if 'transaction_date' in df_clean.columns:
-            df_clean['transaction_date'] = pd.to_datetime(df_clean['transaction_date']).dt.strftime('%Y-%m-%d')
+            df_clean['transaction_date'] = self._to_iso_date(df_clean['transaction_date'])
         
         if 'post_date' in df_clean.columns:
-            df_clean['post_date'] = pd.to_datetime(df_clean['post_date']).dt.strftime('%Y-%m-%d')
+            df_clean['post_date'] = self._to_iso_date(df_clean['post_date'])
         
-        # Clean amount (remove commas, convert to float)
+        # Clean amount (remove commas and dollar signs, convert to float).
+        # read_csv already yields float64 for plain numeric amounts.
         if 'amount' in df_clean.columns:
-            df_clean['amount'] = df_clean['amount'].astype(float)
+            amounts = df_clean['amount']
+            if pd.api.types.is_object_dtype(amounts) or pd.api.types.is_string_dtype(amounts):
+                parsed = pd.to_numeric(
+                    amounts.astype(str).str.replace(r'[,$]', '', regex=True),
+                    errors='coerce'
+                )
+                unparsed = parsed.isna() & amounts.notna()
+                if unparsed.any():
+                    logger.warning("⚠️  Could not parse %d amount(s), e.g. %s",
+                                   unparsed.sum(), list(amounts[unparsed].unique()[:5]))
+                df_clean['amount'] = parsed
         
         # Remove any completely empty rows
-        df_clean = df_clean.dropna(how='all')
+        df_clean.dropna(how='all', inplace=True)
         
         # Fill missing memos with empty string
         if 'memo' in df_clean.columns:
@@ -103,12 +155,63 @@ class ChaseImporter:
         else:
             df_clean['memo'] = ''
         
-        print(f"\n✅ Cleaned data:")
-        print(f"   Columns: {list(df_clean.columns)}")
-        print(f"   Rows: {len(df_clean)}")
-        print(f"   Date range: {df_clean['transaction_date'].min()} to {df_clean['transaction_date'].max()}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("✅ Cleaned data: %d rows, columns %s", len(df_clean), list(df_clean.columns))
+            if 'transaction_date' in df_clean.columns:
+                logger.info("✅ Date range: %s to %s",
+                            df_clean['transaction_date'].min(), df_clean['transaction_date'].max())
         
         return df_clean
+    
+    def _map_columns(self, columns) -> dict:
+        """
+        Map CSV headers to transactions columns. Exact Chase headers map
+        directly; any remaining headers are matched by keyword.
+        """
+        column_mapping = {col: CHASE_HEADER_MAP[col] for col in columns if col in CHASE_HEADER_MAP}
+        
+        # Chase format may vary slightly
+        unmatched = [col for col in columns if col not in column_mapping]
+        if unmatched:
+            taken = set(column_mapping.values())
+            for col, target in self._match_columns(unmatched).items():
+                if target not in taken:
+                    column_mapping[col] = target
+                    taken.add(target)
+        
+        return column_mapping
+    
+    @staticmethod
+    def _match_columns(columns) -> dict:
+        """Map non-standard headers to transactions columns by keyword."""
+        column_mapping = {}
+        
+        for col in columns:
+            col_lower = col.lower().strip()
+            if 'transaction' in col_lower and 'date' in col_lower:
+                column_mapping[col] = 'transaction_date'
+            elif 'post' in col_lower and 'date' in col_lower:
+                column_mapping[col] = 'post_date'
+            elif 'description' in col_lower:
+                column_mapping[col] = 'description'
+            elif 'category' in col_lower:
+                column_mapping[col] = 'original_category'
+            elif 'type' in col_lower:
+                column_mapping[col] = 'transaction_type'
+            elif 'amount' in col_lower:
+                column_mapping[col] = 'amount'
+            elif 'memo' in col_lower:
+                column_mapping[col] = 'memo'
+        
+        return column_mapping
+    
+    @staticmethod
+    def _to_iso_date(dates: pd.Series) -> pd.Series:
+        """Format dates as YYYY-MM-DD strings with a vectorized cast. Missing dates stay NaN."""
+        # No-op for columns already parsed by read_csv
+        parsed = pd.to_datetime(dates)
+        iso = parsed.values.astype('datetime64[D]').astype(str)
+        return pd.Series(iso, index=dates.index, dtype=object).where(parsed.notna())
 
 
 class ImportManager:
@@ -134,13 +237,15 @@ class ImportManager:
                 account_name = f"Chase - {Path(file_path).stem}"
             return self.chase_importer.import_csv(file_path, account_name)
         else:
-            print(f"❌ Unsupported institution: {institution}")
-            print(f"   Currently supported: chase")
+            logger.error("❌ Unsupported institution: %s", institution)
+            logger.error("   Currently supported: chase")
             return 0
 
 
 # Test/Usage script
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     print("="*70)
     print("MoneyMatters - Transaction Importer")
     print("="*70)
@@ -215,9 +320,9 @@ if __name__ == "__main__":
         print("="*70)
         
         recent = db.get_transactions(limit=10)
-        for _, row in recent.iterrows():
-            amount_str = f"${abs(row['amount']):,.2f}"
-            symbol = "💸" if row['amount'] < 0 else "💰"
-            print(f"{symbol} {row['transaction_date']} | {row['description'][:40]:40} | {amount_str:>12}")
+        for row in recent.itertuples(index=False):
+            amount_str = f"${abs(row.amount):,.2f}"
+            symbol = "💸" if row.amount < 0 else "💰"
+            print(f"{symbol} {row.transaction_date} | {row.description[:40]:40} | {amount_str:>12}")
     
     db.close()
\ No newline at end of file